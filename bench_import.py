@@ -0,0 +1,72 @@
+"""Benchmark how long `import realnews` takes in a fresh interpreter.
+
+Also checks that neither the import nor a trending-only run (chunking and
+keyword counting) pulls in any of the heavy dependencies, which should only
+load when the fetch or LLM stages run.
+
+Usage: python bench_import.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    'feedparser',
+    'requests',
+    'langchain',
+    'langchain_core',
+    'langchain_text_splitters',
+    'langchain_google_genai',
+    'langchain_community',
+    'chromadb'
+]
+
+SNIPPET = f"""
+import sys, time
+start = time.perf_counter()
+import realnews
+elapsed = time.perf_counter() - start
+
+store = realnews.ArticleStore()
+for k in range(50):
+    store.add_article("Title " + str(k) + ". " + "science news words " * 100,
+                      "Title " + str(k), "https://example.com/" + str(k), "", "feed")
+realnews.detect_trending_topics(realnews.split_docs(store, log=lambda msg: None))
+
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed)
+print(",".join(loaded))
+"""
+
+
+def measure_once():
+    out = subprocess.run(
+        [sys.executable, '-c', SNIPPET],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    loaded = out[1].split(",") if len(out) > 1 and out[1] else []
+    return float(out[0]), loaded
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        elapsed, loaded = measure_once()
+        timings.append(elapsed * 1000)
+
+    print(f"import realnews over {runs} runs: "
+          f"min {min(timings):.2f} ms | median {statistics.median(timings):.2f} ms | "
+          f"max {max(timings):.2f} ms")
+
+    if loaded:
+        print(f"❌ Heavy modules loaded by import or trending-only run: {', '.join(loaded)}")
+        sys.exit(1)
+    print("✅ No heavy modules loaded by import or trending-only run")
+
+
+if __name__ == '__main__':
+    main()
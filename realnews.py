@@ -3,35 +3,19 @@ import time
 from datetime import datetime, timedelta
 from collections import Counter
 import json
-import feedparser
-import requests
-from urllib.parse import urljoin
-
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains.summarize import load_summarize_chain
-from langchain.prompts import PromptTemplate
-from langchain.schema import Document
-
-# Install required packages if not already installed
-required_packages = {
-    'feedparser': 'feedparser',
-    'requests': 'requests', 
-    'dateutil': 'python-dateutil'
-}
-
-for package, install_name in required_packages.items():
-    try:
-        __import__(package)
-    except ImportError:
-        print(f"Installing {install_name}...")
-        os.system(f"pip install {install_name}")
+import re
+import hashlib
+import mmap
+import struct
+import sys
+import threading
+from array import array
 
-# -------------------
-# Google Gemini Configuration
-# -------------------
-os.environ['GOOGLE_API_KEY'] = 'your api key'
+# Heavy dependencies (feedparser, requests, LangChain, Gemini, Chroma) are
+# imported inside the stage that needs them, so importing this module stays
+# cheap and a fetch-only or trending-only run never loads the LLM stack.
+# Install them with `pip install -r requirements.txt` and set GOOGLE_API_KEY
+# in the environment before running the LLM stages.
 
 # -------------------
 # News Sources & Settings
@@ -47,13 +31,370 @@ DB_DIR = './news_vectorstore'
 USER_KEYWORDS = ["technology", "science", "politics", "artificial intelligence", "machine learning"]
 RECENT_HOURS = 168  # 1 week to ensure we get articles
 MIN_CHUNK_WORDS = 20  # Minimum words in a chunk
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# -------------------
+# Compact Article Store
+# -------------------
+
+_STORE_MAGIC = b'NEWSTORE'
+_STORE_VERSION = 1
+_STORE_HEADER = struct.Struct('<8sIIIQQ')  # magic, version, articles, chunks, meta bytes, text bytes
+
+
+def _uint_typecode(size):
+    # array item sizes vary by platform; pick the code with the exact width
+    for typecode in 'HILQ':
+        if array(typecode).itemsize == size:
+            return typecode
+    raise RuntimeError(f"No {size}-byte unsigned array type on this platform")
+
+
+_U32 = _uint_typecode(4)
+_U64 = _uint_typecode(8)
+
+
+def _align8(n):
+    return (n + 7) & ~7
+
+
+def _replace_atomically(path, write):
+    """Write a file through a uniquely named temp file, then rename it into place"""
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f"{os.path.basename(path)}.", suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _column_bytes(column):
+    """Little-endian bytes of an array or memoryview column"""
+    if sys.byteorder == 'big':
+        column = array(getattr(column, 'typecode', None) or column.format, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column_view(buf, pos, typecode, count):
+    """Read-only column over a mapped file, copied only on big-endian hosts"""
+    size = array(typecode).itemsize * count
+    if sys.byteorder == 'big':
+        column = array(typecode)
+        column.frombytes(buf[pos:pos + size])
+        column.byteswap()
+        return column
+    return buf[pos:pos + size].cast(typecode)
+
+
+def _parse_store(mm, views):
+    """Validate a mapped store file and return its metadata, columns and text offset.
+
+    Column views are appended to ``views`` as they are created so the caller
+    can release them if validation fails.
+    """
+    magic, version, n_articles, n_chunks, meta_len, text_len = _STORE_HEADER.unpack_from(mm, 0)
+    if magic != _STORE_MAGIC or version != _STORE_VERSION:
+        raise ValueError("unsupported format")
+
+    pos = _align8(_STORE_HEADER.size + meta_len)
+    expected = pos + 8 * (n_articles + 1) + 4 * (n_articles + 3 * n_chunks) + text_len
+    if len(mm) != expected:
+        raise ValueError(f"expected {expected} bytes, found {len(mm)}")
+
+    meta = json.loads(mm[_STORE_HEADER.size:_STORE_HEADER.size + meta_len].decode('utf-8'))
+    if not isinstance(meta, dict):
+        raise ValueError("metadata is not an object")
+    for name in ('feeds', 'titles', 'links', 'published'):
+        values = meta.get(name)
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"metadata '{name}' is missing or not a list of strings")
+        if name != 'feeds' and len(values) != n_articles:
+            raise ValueError(f"metadata '{name}' does not match article count")
+
+    views.append(memoryview(mm))
+    columns = []
+    for typecode, count in ((_U64, n_articles + 1), (_U32, n_articles),
+                            (_U32, n_chunks), (_U32, n_chunks), (_U32, n_chunks)):
+        column = _column_view(views[0], pos, typecode, count)
+        if isinstance(column, memoryview):
+            views.append(column)
+        columns.append(column)
+        pos += array(typecode).itemsize * count
+
+    text_offsets, feed_index, chunk_parent = columns[:3]
+    if text_offsets[0] != 0 or text_offsets[-1] != text_len or any(
+            text_offsets[i] > text_offsets[i + 1] for i in range(n_articles)):
+        raise ValueError("text offsets are out of range")
+    if n_articles and max(feed_index) >= len(meta['feeds']):
+        raise ValueError("feed index out of range")
+    if n_chunks and max(chunk_parent) >= n_articles:
+        raise ValueError("chunk parent out of range")
+    return meta, columns, pos
+
+
+def _article_key(content, title, link):
+    # Use link as primary key, title as fallback
+    return link or title or content
+
+
+class ArticleStore:
+    """Columnar store for fetched articles and their chunks.
+
+    Each article is stored once: its metadata lives in parallel columns and its
+    feed URL is interned and referenced by index. Chunks are (parent, start,
+    length) views into the parent article text, so no text or metadata is
+    copied per chunk. LangChain ``Document`` objects are only built on demand.
+    """
+
+    def __init__(self):
+        self.feeds = []
+        self._feed_ids = {}
+        self.feed_index = array(_U32)
+        self.titles = []
+        self.links = []
+        self.published = []
+        self._texts = []
+        self._keys = set()
+
+        self.chunk_parent = array(_U32)
+        self.chunk_start = array(_U32)
+        self.chunk_length = array(_U32)
+
+        # Set when the store was loaded from disk: columns are views over the
+        # mapped file and article text is decoded from it on demand.
+        self._blob = None
+        self._blob_base = 0
+        self._text_offsets = None
+        self._views = []
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add_article(self, content, title, link, published, feed_url):
+        """Append an article, returning its index or -1 if it is a duplicate"""
+        key = _article_key(content, title, link)
+        if key in self._keys:
+            return -1
+        self._keys.add(key)
+
+        feed_id = self._feed_ids.get(feed_url)
+        if feed_id is None:
+            feed_id = len(self.feeds)
+            self.feeds.append(sys.intern(feed_url))
+            self._feed_ids[feed_url] = feed_id
+
+        self._materialize()
+        self.feed_index.append(feed_id)
+        self.titles.append(title)
+        self.links.append(link)
+        self.published.append(published)
+        self._texts.append(content)
+        return len(self.titles) - 1
+
+    def text(self, i):
+        if self._blob is not None:
+            start = self._blob_base + self._text_offsets[i]
+            end = self._blob_base + self._text_offsets[i + 1]
+            return self._blob[start:end].decode('utf-8')
+        return self._texts[i]
+
+    def metadata(self, i):
+        return {
+            'source': self.links[i],
+            'link': self.links[i],
+            'title': self.titles[i],
+            'published': self.published[i],
+            'feed_url': self.feeds[self.feed_index[i]],
+            'article_key': self.article_key(i)
+        }
+
+    def _materialize(self):
+        # Modifying a store loaded from disk needs its columns back in memory
+        if self._blob is not None:
+            self._texts = [self.text(i) for i in range(len(self))]
+            self.feed_index = array(_U32, self.feed_index)
+            self.chunk_parent = array(_U32, self.chunk_parent)
+            self.chunk_start = array(_U32, self.chunk_start)
+            self.chunk_length = array(_U32, self.chunk_length)
+            self._text_offsets = None
+            self.close()
+
+    def close(self):
+        """Unmap a store loaded from disk.
+
+        Columns still backed by the file become unusable; the article keys
+        used by ``diff`` stay available.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+
+    # Chunks
+
+    @property
+    def chunks(self):
+        return ChunkView(self)
+
+    def add_chunk(self, parent, start, length):
+        self._materialize()
+        self.chunk_parent.append(parent)
+        self.chunk_start.append(start)
+        self.chunk_length.append(length)
+
+    def chunk_text(self, i):
+        start = self.chunk_start[i]
+        return self.text(self.chunk_parent[i])[start:start + self.chunk_length[i]]
+
+    def clear_chunks(self):
+        self.chunk_parent = array(_U32)
+        self.chunk_start = array(_U32)
+        self.chunk_length = array(_U32)
+
+    # Serialization
+
+    def save(self, path):
+        """Write the store to a single file that ``load`` can memory-map"""
+        meta = json.dumps({
+            'feeds': self.feeds,
+            'titles': self.titles,
+            'links': self.links,
+            'published': self.published
+        }).encode('utf-8')
+        meta_end = _STORE_HEADER.size + len(meta)
+
+        def write(f):
+            # Header and text offsets are filled in once the text has been
+            # streamed out, so encoded text is never held in memory at once.
+            f.write(b'\0' * _STORE_HEADER.size)
+            f.write(meta)
+            f.write(b'\0' * (_align8(meta_end) - meta_end))
+            offsets_pos = f.tell()
+            f.write(b'\0' * (8 * (len(self) + 1)))
+            for column in (self.feed_index, self.chunk_parent,
+                           self.chunk_start, self.chunk_length):
+                f.write(_column_bytes(column))
+
+            text_offsets = array(_U64, [0])
+            for i in range(len(self)):
+                text_offsets.append(text_offsets[-1] + f.write(self.text(i).encode('utf-8')))
+
+            f.seek(0)
+            f.write(_STORE_HEADER.pack(
+                _STORE_MAGIC, _STORE_VERSION, len(self), len(self.chunk_parent),
+                len(meta), text_offsets[-1]
+            ))
+            f.seek(offsets_pos)
+            f.write(_column_bytes(text_offsets))
+
+        _replace_atomically(path, write)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a file written by ``save``; raises ValueError if it is invalid"""
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            # Raised for empty files, which cannot be mapped
+            raise ValueError(f"Invalid article store file {path}: {e}") from e
+
+        store = cls()
+        views = []
+        try:
+            meta, columns, text_base = _parse_store(mm, views)
+            store.feeds = [sys.intern(url) for url in meta['feeds']]
+            store._feed_ids = {url: i for i, url in enumerate(store.feeds)}
+            store.titles = meta['titles']
+            store.links = meta['links']
+            store.published = meta['published']
+            (store._text_offsets, store.feed_index, store.chunk_parent,
+             store.chunk_start, store.chunk_length) = columns
+
+            store._views = views
+            store._blob = mm
+            store._blob_base = text_base
+            store._keys = {store.article_key(i) for i in range(len(store))}
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            store._views = views
+            store._blob = mm
+            store.close()
+            raise ValueError(f"Invalid article store file {path}: {e}") from e
+        return store
+
+    def article_key(self, i):
+        if self.links[i] or self.titles[i]:
+            return _article_key(None, self.titles[i], self.links[i])
+        return _article_key(self.text(i), self.titles[i], self.links[i])
+
+    def chunk_ids(self):
+        """Stable chunk ids: a hash of the article key plus the chunk's position in it"""
+        ids = []
+        previous = None
+        for parent in self.chunk_parent:
+            if parent != previous:
+                prefix = hashlib.sha1(self.article_key(parent).encode('utf-8')).hexdigest()[:16]
+                position = 0
+                previous = parent
+            ids.append(f"{prefix}-{position}")
+            position += 1
+        return ids
+
+    def diff(self, previous):
+        """Indices of articles in this store that the previous store does not contain"""
+        return [i for i in range(len(self)) if self.article_key(i) not in previous._keys]
+
+
+class ChunkView:
+    """Sequence of chunks in an ``ArticleStore``; items are built as Documents"""
+
+    __slots__ = ('store',)
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store.chunk_parent)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('chunk index out of range')
+        from langchain_core.documents import Document
+
+        store = self.store
+        return Document(
+            page_content=store.chunk_text(i),
+            metadata=store.metadata(store.chunk_parent[i])
+        )
+
+    def texts(self):
+        for i in range(len(self)):
+            yield self.store.chunk_text(i)
 
 # -------------------
 # Simple RSS Feed Fetcher
 # -------------------
 
-def fetch_rss_feed(url, timeout=10):
-    """Fetch and parse RSS feed using feedparser directly"""
+def fetch_rss_feed(url, store, timeout=10, log=print):
+    """Fetch and parse RSS feed using feedparser, adding its articles to store"""
+    import feedparser
+    import requests
+
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -66,7 +407,7 @@ def fetch_rss_feed(url, timeout=10):
         # Parse with feedparser
         feed = feedparser.parse(response.content)
         
-        documents = []
+        added = 0
         for entry in feed.entries:
             # Extract content
             title = getattr(entry, 'title', 'No Title')
@@ -77,87 +418,156 @@ def fetch_rss_feed(url, timeout=10):
             # Clean and combine content
             content = f"{title}\n\n{summary}" if summary else title
             
-            # Create document
+            # Store article (duplicates are skipped by the store)
             if content and len(content.strip()) > 50:  # Only include substantial content
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        'source': link,
-                        'link': link,
-                        'title': title,
-                        'published': published,
-                        'feed_url': url
-                    }
-                )
-                documents.append(doc)
+                if store.add_article(content, title, link, published, url) >= 0:
+                    added += 1
         
-        return documents
+        return added
         
     except Exception as e:
-        print(f"Error fetching {url}: {e}")
-        return []
+        log(f"Error fetching {url}: {e}")
+        return 0
 
 # -------------------
 # Ingestion & Preprocessing
 # -------------------
 
-def fetch_and_clean():
-    all_docs = []
+def fetch_and_clean(feeds=None, log=print):
+    store = ArticleStore()
     cutoff = datetime.utcnow() - timedelta(hours=RECENT_HOURS)
     
-    for feed_url in RSS_FEEDS:
-        print(f"Fetching from: {feed_url}")
-        docs = fetch_rss_feed(feed_url)
-        print(f"Loaded {len(docs)} articles from {feed_url}")
-        all_docs.extend(docs)
-    
-    # Remove duplicates based on link or title
-    unique_docs = {}
-    for doc in all_docs:
-        # Use link as primary key, title as fallback
-        key = doc.metadata.get('link') or doc.metadata.get('title', str(hash(doc.page_content)))
-        if key not in unique_docs:
-            unique_docs[key] = doc
+    for feed_url in feeds or RSS_FEEDS:
+        log(f"Fetching from: {feed_url}")
+        added = fetch_rss_feed(feed_url, store, log=log)
+        log(f"Loaded {added} articles from {feed_url}")
     
-    final_docs = list(unique_docs.values())
-    print(f"Total unique articles after deduplication: {len(final_docs)}")
-    return final_docs
-
-def split_docs(docs, chunk_size=1000, chunk_overlap=200):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ". ", " ", ""]
-    )
+    log(f"Total unique articles after deduplication: {len(store)}")
+    return store
+
+# Chunking follows LangChain's RecursiveCharacterTextSplitter (keep_separator,
+# strip_whitespace) so chunks are unchanged, without importing LangChain for
+# fetch-only and trending-only runs.
+
+def _split_on(text, separator):
+    # Each separator stays at the start of the piece that follows it
+    if not separator:
+        return list(text)
+    parts = re.split(f"({re.escape(separator)})", text)
+    splits = [parts[0]] + [parts[i] + parts[i + 1] for i in range(1, len(parts), 2)]
+    return [piece for piece in splits if piece != ""]
+
+def _merge_splits(splits, separator, chunk_size, chunk_overlap):
+    chunks = []
+    current = []
+    total = 0
+    for piece in splits:
+        extra = len(separator) if current else 0
+        if total + len(piece) + extra > chunk_size and current:
+            chunk = separator.join(current).strip()
+            if chunk:
+                chunks.append(chunk)
+            # Keep the tail of the current chunk as overlap for the next one
+            while total > chunk_overlap or (
+                total + len(piece) + (len(separator) if current else 0) > chunk_size and total > 0
+            ):
+                total -= len(current[0]) + (len(separator) if len(current) > 1 else 0)
+                current = current[1:]
+        current.append(piece)
+        total += len(piece) + (len(separator) if len(current) > 1 else 0)
+    chunk = separator.join(current).strip()
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def _split_text(text, chunk_size, chunk_overlap, separators=CHUNK_SEPARATORS):
+    separator = separators[-1]
+    remaining = []
+    for i, candidate in enumerate(separators):
+        if candidate == "":
+            separator = candidate
+            break
+        if candidate in text:
+            separator = candidate
+            remaining = separators[i + 1:]
+            break
+
     chunks = []
-    for d in docs:
+    good = []
+    for piece in _split_on(text, separator):
+        if len(piece) < chunk_size:
+            good.append(piece)
+            continue
+        if good:
+            chunks.extend(_merge_splits(good, "", chunk_size, chunk_overlap))
+            good = []
+        if remaining:
+            chunks.extend(_split_text(piece, chunk_size, chunk_overlap, remaining))
+        else:
+            chunks.append(piece)
+    if good:
+        chunks.extend(_merge_splits(good, "", chunk_size, chunk_overlap))
+    return chunks
+
+def split_docs(store, chunk_size=1000, chunk_overlap=200, log=print):
+    store.clear_chunks()
+    for i in range(len(store)):
         try:
-            doc_chunks = splitter.split_documents([d])
-            for chunk in doc_chunks:
-                if len(chunk.page_content.split()) >= MIN_CHUNK_WORDS:
-                    chunks.append(chunk)
+            text = store.text(i)
+            # Locate each chunk in the article, as add_start_index does
+            index = 0
+            previous_len = 0
+            for chunk in _split_text(text, chunk_size, chunk_overlap):
+                index = text.find(chunk, max(0, index + previous_len - chunk_overlap))
+                previous_len = len(chunk)
+                if index >= 0 and len(chunk.split()) >= MIN_CHUNK_WORDS:
+                    store.add_chunk(i, index, len(chunk))
+                index = max(index, 0)
         except Exception as e:
-            print(f"Error splitting document: {e}")
+            log(f"Error splitting document: {e}")
             continue
-    return chunks
+    return store.chunks
 
 # -------------------
 # Embedding & Storage
 # -------------------
 
-def get_vectorstore():
+def add_chunks(vectorstore, chunks, parents=None, batch_size=256):
+    """Embed chunks under stable ids; with parents, only the chunks of those articles"""
+    ids = chunks.store.chunk_ids()
+    selected = [
+        i for i, parent in enumerate(chunks.store.chunk_parent)
+        if parents is None or parent in parents
+    ]
+    # Documents are built one batch at a time to keep peak memory low
+    for start in range(0, len(selected), batch_size):
+        batch = selected[start:start + batch_size]
+        vectorstore.add_documents([chunks[i] for i in batch], ids=[ids[i] for i in batch])
+    return len(selected)
+
+def get_vectorstore(persist_directory=None, log=print):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from langchain_community.vectorstores import Chroma
+
     try:
         embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        return Chroma(persist_directory=DB_DIR, embedding_function=embeddings)
+        return Chroma(persist_directory=persist_directory or DB_DIR, embedding_function=embeddings)
     except Exception as e:
-        print(f"Error creating vectorstore: {e}")
+        log(f"Error creating vectorstore: {e}")
         raise
 
 # -------------------
 # Summarization
 # -------------------
 
-def summarize_text(docs):
+def _fallback_summary(docs):
+    # First 200 characters, used when the LLM is unavailable
+    return docs[0].page_content[:200] + "..." if docs else "No summary available"
+
+def summarize_text(docs, fallback=True, log=print):
+    """Summarize documents; with fallback=False, LLM errors are raised"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     try:
         llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
         
@@ -168,18 +578,23 @@ def summarize_text(docs):
             return response.content
         else:
             # For multiple documents, use chain
+            from langchain.chains.summarize import load_summarize_chain
             chain = load_summarize_chain(llm, chain_type="map_reduce")
             return chain.run(docs)
     except Exception as e:
-        print(f"Error summarizing: {e}")
-        # Return first 200 characters as fallback
-        return docs[0].page_content[:200] + "..." if docs else "No summary available"
+        if not fallback:
+            raise
+        log(f"Error summarizing: {e}")
+        return _fallback_summary(docs)
 
 # -------------------
 # Sentiment Analysis
 # -------------------
 
-def analyze_sentiment(text):
+def analyze_sentiment(text, fallback=True, log=print):
+    """Classify sentiment; with fallback=False, LLM errors are raised"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     try:
         prompt = f"""
 Analyze the sentiment of this news summary. Respond with exactly one word: Positive, Neutral, or Negative.
@@ -199,7 +614,9 @@ Sentiment:"""
             return "Neutral"
             
     except Exception as e:
-        print(f"Error analyzing sentiment: {e}")
+        if not fallback:
+            raise
+        log(f"Error analyzing sentiment: {e}")
         return "Neutral"
 
 # -------------------
@@ -210,11 +627,11 @@ def detect_trending_topics(chunks, top_n=5):
     words = []
     stop_words = {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'who', 'boy', 'did', 'she', 'use', 'her', 'now', 'oil', 'sit', 'way', 'who', 'own', 'say'}
     
-    for doc in chunks:
+    for text in chunks.texts():
         # Extract meaningful words
         content_words = [
             word.lower().strip('.,!?";()[]{}') 
-            for word in doc.page_content.split() 
+            for word in text.split() 
             if len(word) > 3 and word.lower() not in stop_words and word.isalpha()
         ]
         words.extend(content_words)
@@ -222,18 +639,102 @@ def detect_trending_topics(chunks, top_n=5):
     freq = Counter(words)
     return [w for w, _ in freq.most_common(top_n)]
 
+# -------------------
+# Report Snapshots
+# -------------------
+
+SNAPSHOT_DIR = './news_snapshots'
+SNAPSHOT_VERSION = 3
+SNAPSHOT_REFRESH_MINUTES = 15  # Saved reports checked more recently than this are not refreshed in the background
+
+_snapshot_locks = {}
+_snapshot_locks_guard = threading.Lock()
+
+def snapshot_key(feeds, keywords, hours):
+    """Stable key for an analysis configuration"""
+    config = {
+        'feeds': sorted(url.strip() for url in feeds),
+        'keywords': [kw.strip() for kw in keywords],
+        'hours': int(hours)
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def _snapshot_path(key, suffix):
+    return os.path.join(SNAPSHOT_DIR, f"{key}{suffix}")
+
+def _snapshot_lock(key):
+    # One lock per configuration, shared by foreground runs and background refreshes
+    with _snapshot_locks_guard:
+        return _snapshot_locks.setdefault(key, threading.Lock())
+
+def _write_report(snapshot):
+    data = json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _replace_atomically(_snapshot_path(snapshot['key'], '.json'), lambda f: f.write(data))
+
+def save_snapshot(articles, results, trending, feeds, keywords, hours):
+    """Save a completed analysis as a report file plus its article store"""
+    key = snapshot_key(feeds, keywords, hours)
+    now = datetime.utcnow().isoformat(timespec='seconds')
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'created': now,
+        'checked': now,
+        'feeds': list(feeds),
+        'keywords': list(keywords),
+        'hours': int(hours),
+        'trending': trending,
+        'results': results
+    }
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    articles.save(_snapshot_path(key, '.articles'))
+    _write_report(snapshot)
+    return snapshot
+
+def touch_snapshot(snapshot):
+    """Record that a saved report was just checked against its feeds"""
+    snapshot = dict(snapshot, checked=datetime.utcnow().isoformat(timespec='seconds'))
+    _write_report(snapshot)
+    return snapshot
+
+def load_snapshot(key):
+    """Load the saved report for a configuration key, or None"""
+    try:
+        with open(_snapshot_path(key, '.json'), encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    if not all(name in snapshot for name in ('key', 'created', 'checked', 'results', 'trending')):
+        return None
+    if not isinstance(snapshot['results'], list) or not all(isinstance(item, dict) for item in snapshot['results']):
+        return None
+    return snapshot
+
+def load_snapshot_articles(key):
+    """Memory-map the articles a saved report was built from, or None"""
+    try:
+        return ArticleStore.load(_snapshot_path(key, '.articles'))
+    except (OSError, ValueError):
+        return None
+
+def snapshot_age_minutes(snapshot):
+    """Minutes since the report was last checked against its feeds"""
+    checked = datetime.fromisoformat(snapshot['checked'])
+    return (datetime.utcnow() - checked).total_seconds() / 60
+
 # -------------------
 # Delivery Methods
 # -------------------
 
-def deliver_console(items, chunks):
+def deliver_console(items, trending=None):
     print("\n" + "="*60)
     print("📰 NEWS ANALYSIS REPORT")
     print("="*60)
     
-    if chunks:
+    if trending:
         print("\n🔥 TRENDING KEYWORDS:")
-        trending = detect_trending_topics(chunks)
         print(", ".join(trending))
     
     print(f"\n📋 TOP {len(items)} NEWS ARTICLES:\n")
@@ -243,86 +744,227 @@ def deliver_console(items, chunks):
         print(f"   🔗 Link: {item['url']}\n")
 
 # -------------------
-# Main Pipeline
+# Analysis Pipeline
 # -------------------
 
-def main():
-    try:
-        # 1. Ingest & preprocess
-        print("📡 Fetching and cleaning news articles...")
-        raw_docs = fetch_and_clean()
-        
-        if not raw_docs:
-            print("❌ No articles found. Please check your internet connection and RSS feeds.")
-            return
+def analyze_candidates(candidates, keywords, previous_results=None, max_articles=8, delay=2, log=print):
+    """Summarize and score candidates, reusing results already in a previous report.
+
+    Results are matched by the same article key the ArticleStore dedupes on.
+    Results where the LLM failed keep a fallback summary but are marked
+    ``analyzed: False``, so they are retried instead of reused.
+    """
+    reusable = {
+        item['article_key']: item for item in previous_results or []
+        if item.get('analyzed') and item.get('article_key')
+    }
+    results = []
+    max_articles = min(max_articles, len(candidates))  # Limit to avoid rate limits
+    
+    for i, doc in enumerate(candidates[:max_articles]):
+        url = doc.metadata.get('source') or doc.metadata.get('link', 'N/A')
+        article_key = doc.metadata.get('article_key')
+        if article_key and article_key in reusable:
+            log(f"Reusing analysis for article {i+1}/{max_articles}")
+            results.append(reusable[article_key])
+            continue
         
-        print(f"✅ Found {len(raw_docs)} articles")
+        log(f"Processing article {i+1}/{max_articles}...")
+        try:
+            summary = summarize_text([doc], fallback=False, log=log)
+            sentiment = analyze_sentiment(summary, fallback=False, log=log)
+            analyzed = True
+        except Exception as e:
+            log(f"❌ Error processing document {i+1}: {e}")
+            summary = _fallback_summary([doc])
+            sentiment = "Neutral"
+            analyzed = False
         
-        # 2. Split documents
-        print("📄 Splitting documents into chunks...")
-        chunks = split_docs(raw_docs)
-        print(f"✅ Created {len(chunks)} chunks")
-
-        if not chunks:
-            print("❌ No valid chunks created.")
-            return
-
-        # 3. Create vector store
-        print("🔍 Creating vector store...")
-        store = get_vectorstore()
-        store.add_documents(chunks)
-        store.persist()
-        print("✅ Vector store created")
-
-        # 4. Retrieve relevant documents
-        print("🎯 Retrieving relevant documents...")
-        profile_query = " ".join(USER_KEYWORDS)
-        retriever = store.as_retriever(
-            search_type="similarity", 
-            search_kwargs={"k": min(10, len(chunks))}
+        # Find matching topic
+        summary_lower = summary.lower()
+        topic = next(
+            (kw for kw in keywords if kw.lower() in summary_lower), 
+            "General"
         )
-        candidates = retriever.get_relevant_documents(profile_query)
-        print(f"✅ Retrieved {len(candidates)} relevant documents")
-
-        # 5. Analyze articles
-        print("🧠 Analyzing articles...")
-        results = []
-        max_articles = min(8, len(candidates))  # Limit to avoid rate limits
         
-        for i, doc in enumerate(candidates[:max_articles]):
-            print(f"Processing article {i+1}/{max_articles}...")
-            try:
-                summary = summarize_text([doc])
-                sentiment = analyze_sentiment(summary)
-                
-                # Find matching topic
-                summary_lower = summary.lower()
-                topic = next(
-                    (kw for kw in USER_KEYWORDS if kw.lower() in summary_lower), 
-                    "General"
-                )
-                
-                url = doc.metadata.get('source') or doc.metadata.get('link', 'N/A')
-                
-                results.append({
-                    "summary": summary, 
-                    "sentiment": sentiment, 
-                    "topic": topic, 
-                    "url": url
-                })
-                
-                # Rate limiting
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"❌ Error processing document {i+1}: {e}")
-                continue
-
-        # 6. Display results
-        if results:
-            deliver_console(results, chunks)
-        else:
-            print("❌ No results to display.")
+        results.append({
+            "summary": summary, 
+            "sentiment": sentiment, 
+            "topic": topic, 
+            "url": url,
+            "title": doc.metadata.get('title', 'Untitled'),
+            "article_key": article_key,
+            "analyzed": analyzed
+        })
+        
+        # Rate limiting
+        time.sleep(delay)
+    
+    return results
+
+def run_analysis(feeds, keywords, hours, delay=2, log=print):
+    """Run the full pipeline and save the report as a snapshot.
+
+    Runs for the same configuration never overlap: a second run waits, then
+    builds on the report the first one saved. Each configuration keeps its
+    own vector store next to the snapshot, so only chunks of new articles are
+    embedded and only articles without a usable result are analyzed. If the
+    feeds are unchanged the report is just marked as checked. Returns None
+    when no report could be produced.
+    """
+    key = snapshot_key(feeds, keywords, hours)
+    lock = _snapshot_lock(key)
+    if not lock.acquire(blocking=False):
+        log("⏳ Waiting for the running refresh of this report to finish...")
+        lock.acquire()
+    try:
+        return _run_analysis(key, feeds, keywords, hours, load_snapshot(key), delay, log)
+    finally:
+        lock.release()
+
+def _run_analysis(key, feeds, keywords, hours, previous, delay, log):
+    # 1. Ingest & preprocess
+    log("📡 Fetching and cleaning news articles...")
+    articles = fetch_and_clean(feeds, log=log)
+    
+    if not articles:
+        log("❌ No articles found. Please check your internet connection and RSS feeds.")
+        return None
+    
+    log(f"✅ Found {len(articles)} articles")
+    
+    # 2. Compare with the previous report
+    db_dir = _snapshot_path(key, '.chroma')
+    new_articles = None  # None means the vector store is rebuilt from scratch
+    stale_ids = []
+    seen = load_snapshot_articles(key) if previous else None
+    if seen is not None:
+        try:
+            new = articles.diff(seen)
+            dropped = set(seen.diff(articles))
+            if dropped:
+                seen_ids = seen.chunk_ids()
+                stale_ids = [seen_ids[i] for i, parent in enumerate(seen.chunk_parent) if parent in dropped]
+        finally:
+            # Unmap before save_snapshot replaces the same file
+            seen.close()
+        complete = all(item.get('analyzed') for item in previous['results'])
+        if not new and not dropped and complete:
+            log("✅ No changes since the last report")
+            return touch_snapshot(previous)
+        log(f"🆕 {len(new)} new and {len(dropped)} dropped articles since the last report")
+        if os.path.isdir(db_dir):
+            new_articles = set(new)
+    
+    if new_articles is None and os.path.isdir(db_dir):
+        import shutil
+
+        shutil.rmtree(db_dir)
+    
+    # 3. Split documents
+    log("📄 Splitting documents into chunks...")
+    chunks = split_docs(articles, log=log)
+    log(f"✅ Created {len(chunks)} chunks")
+
+    if not chunks:
+        log("❌ No valid chunks created.")
+        return None
+
+    # 4. Update vector store
+    log("🔍 Updating vector store...")
+    store = get_vectorstore(db_dir, log=log)
+    if stale_ids:
+        store.delete(ids=stale_ids)
+    embedded = add_chunks(store, chunks, parents=new_articles)
+    store.persist()
+    log(f"✅ Embedded {embedded} chunks, removed {len(stale_ids)}")
+
+    # 5. Retrieve relevant documents
+    log("🎯 Retrieving relevant documents...")
+    profile_query = " ".join(keywords)
+    retriever = store.as_retriever(
+        search_type="similarity", 
+        search_kwargs={"k": min(10, len(chunks))}
+    )
+    candidates = retriever.get_relevant_documents(profile_query)
+    log(f"✅ Retrieved {len(candidates)} relevant documents")
+
+    # 6. Analyze articles
+    log("🧠 Analyzing articles...")
+    results = analyze_candidates(
+        candidates, keywords,
+        previous_results=previous['results'] if previous else None,
+        delay=delay, log=log
+    )
+
+    if not results:
+        log("❌ No results to display.")
+        return None
+
+    # 7. Trending topics & snapshot
+    log("🔥 Identifying trending topics...")
+    trending = detect_trending_topics(chunks, top_n=5)
+    return save_snapshot(articles, results, trending, feeds, keywords, hours)
+
+# -------------------
+# Background Refresh
+# -------------------
+
+_refresh_threads = {}
+_refresh_started = {}
+_refresh_lock = threading.Lock()
+
+def _refresh(feeds, keywords, hours, delay):
+    key = snapshot_key(feeds, keywords, hours)
+    try:
+        run_analysis(feeds, keywords, hours, delay=delay, log=lambda msg: None)
+    except Exception as e:
+        print(f"Error refreshing snapshot {key}: {e}")
+
+def start_background_refresh(feeds, keywords, hours, delay=2):
+    """Refresh the snapshot for a configuration in a daemon thread.
+
+    At most one refresh per configuration runs every SNAPSHOT_REFRESH_MINUTES.
+    """
+    key = snapshot_key(feeds, keywords, hours)
+    with _refresh_lock:
+        thread = _refresh_threads.get(key)
+        started = _refresh_started.get(key)
+        recent = started is not None and time.time() - started < SNAPSHOT_REFRESH_MINUTES * 60
+        if (thread is None or not thread.is_alive()) and not recent:
+            thread = threading.Thread(
+                target=_refresh,
+                args=(list(feeds), list(keywords), hours, delay),
+                name=f"news-refresh-{key}",
+                daemon=True
+            )
+            _refresh_threads[key] = thread
+            _refresh_started[key] = time.time()
+            thread.start()
+    return thread
+
+def is_refreshing(key):
+    thread = _refresh_threads.get(key)
+    return thread is not None and thread.is_alive()
+
+# -------------------
+# Main Pipeline
+# -------------------
+
+def main():
+    try:
+        # Show the saved report for this configuration straight away
+        key = snapshot_key(RSS_FEEDS, USER_KEYWORDS, RECENT_HOURS)
+        previous = load_snapshot(key)
+        if previous:
+            print(f"⚡ Saved report from {previous['created']} UTC (refreshing below)")
+            deliver_console(previous['results'], previous['trending'])
+
+        snapshot = run_analysis(RSS_FEEDS, USER_KEYWORDS, RECENT_HOURS)
+
+        # Display results if the report changed
+        if snapshot is not None and (previous is None or snapshot['created'] != previous['created']):
+            deliver_console(snapshot['results'], snapshot['trending'])
 
     except Exception as e:
         print(f"💥 An error occurred in main pipeline: {e}")
@@ -1,8 +1,6 @@
 # streamlit_app.py
 import streamlit as st
 import os
-import tempfile
-import time
 import realnews as news_analyzer  # Import your existing analyzer module
 
 # Configure page
@@ -163,6 +161,12 @@ if 'trending' not in st.session_state:
     st.session_state.trending = None
 if 'processing' not in st.session_state:
     st.session_state.processing = False
+if 'report_key' not in st.session_state:
+    st.session_state.report_key = None
+if 'report_created' not in st.session_state:
+    st.session_state.report_created = None
+if 'report_checked' not in st.session_state:
+    st.session_state.report_checked = None
 
 # Sidebar configuration
 with st.sidebar:
@@ -211,84 +215,67 @@ with st.sidebar:
         if api_key:
             os.environ['GOOGLE_API_KEY'] = api_key
         else:
-            st.warning("Using default API key. For best results, provide your own key.")
+            st.warning("No Google API key provided. Set GOOGLE_API_KEY or enter your key above.")
+
+# Current configuration and its saved report
+config_feeds = [url.strip() for url in rss_feeds.split('\n') if url.strip()]
+config_keywords = [kw.strip() for kw in user_keywords.split(",") if kw.strip()]
+config_key = news_analyzer.snapshot_key(config_feeds, config_keywords, recent_hours)
+
+if not st.session_state.processing:
+    snapshot = news_analyzer.load_snapshot(config_key)
+    if snapshot:
+        # Serve the saved report immediately, including after switching configurations,
+        # and pick up newer ones from background refreshes
+        if (st.session_state.results is None or st.session_state.report_key != config_key
+                or snapshot['checked'] != st.session_state.report_checked):
+            st.session_state.results = snapshot['results']
+            st.session_state.trending = snapshot['trending']
+            st.session_state.report_key = config_key
+            st.session_state.report_created = snapshot['created']
+            st.session_state.report_checked = snapshot['checked']
+        
+        if api_key and news_analyzer.snapshot_age_minutes(snapshot) > news_analyzer.SNAPSHOT_REFRESH_MINUTES:
+            os.environ['GOOGLE_API_KEY'] = api_key
+            news_analyzer.start_background_refresh(config_feeds, config_keywords, recent_hours)
 
 # Main content area
 st.title("📰 News Analyzer Dashboard")
 st.markdown("Monitor news trends and get AI-powered analysis of the latest articles")
 
+if st.session_state.report_key == config_key and not st.session_state.processing:
+    if news_analyzer.is_refreshing(config_key):
+        col1, col2 = st.columns([4, 1])
+        col1.caption(f"⚡ Report from {st.session_state.report_created} UTC, checked {st.session_state.report_checked} UTC · 🔄 Refreshing in the background...")
+        col2.button("Check for updates")
+    else:
+        st.caption(f"⚡ Report from {st.session_state.report_created} UTC, checked {st.session_state.report_checked} UTC")
+elif st.session_state.results and not st.session_state.processing:
+    st.warning("These results are for a different configuration. Click \"Analyze News\" to analyze the current one.")
+
 if st.session_state.processing:
     with st.status("Analyzing news sources...", expanded=True) as status:
         try:
-            # Create temp directory for vector store
-            with tempfile.TemporaryDirectory() as temp_dir:
-                news_analyzer.DB_DIR = temp_dir
-                st.session_state.results = []
-                
-                # Execute analysis steps
-                st.write("🔍 Fetching and cleaning news articles...")
-                raw_docs = news_analyzer.fetch_and_clean()
-                
-                if not raw_docs:
-                    status.update(label="❌ No articles found", state="error")
-                    st.error("No articles found. Please check your internet connection and RSS feeds.")
-                    st.session_state.processing = False
-                    st.stop()
-                
-                st.write(f"✅ Found {len(raw_docs)} articles")
-                
-                st.write("📄 Splitting documents into chunks...")
-                chunks = news_analyzer.split_docs(raw_docs)
-                st.write(f"✅ Created {len(chunks)} chunks")
-                
-                st.write("🧠 Processing content with AI...")
-                # Create vector store
-                store = news_analyzer.get_vectorstore()
-                store.add_documents(chunks)
-                store.persist()
-                
-                # Retrieve relevant documents
-                profile_query = " ".join(news_analyzer.USER_KEYWORDS)
-                retriever = store.as_retriever(
-                    search_type="similarity", 
-                    search_kwargs={"k": min(10, len(chunks))}
-                )
-                candidates = retriever.get_relevant_documents(profile_query)
-                
-                # Process each candidate
-                results = []
-                for i, doc in enumerate(candidates[:8]):  # Limit to 8 articles
-                    st.write(f"Analyzing article {i+1}/{min(8, len(candidates))}...")
-                    summary = news_analyzer.summarize_text([doc])
-                    sentiment = news_analyzer.analyze_sentiment(summary)
-                    
-                    # Find matching topic
-                    summary_lower = summary.lower()
-                    topic = next(
-                        (kw for kw in news_analyzer.USER_KEYWORDS if kw.lower() in summary_lower), 
-                        "General"
-                    )
-                    
-                    url = doc.metadata.get('source') or doc.metadata.get('link', 'N/A')
-                    
-                    results.append({
-                        "summary": summary, 
-                        "sentiment": sentiment, 
-                        "topic": topic, 
-                        "url": url,
-                        "title": doc.metadata.get('title', 'Untitled')
-                    })
-                    time.sleep(1)  # Rate limiting
-                
-                # Detect trending topics
-                st.write("🔥 Identifying trending topics...")
-                trending = news_analyzer.detect_trending_topics(chunks, top_n=5)
-                
-                st.session_state.results = results
-                st.session_state.trending = trending
-                st.session_state.processing = False
+            # Only articles missing from the saved report are analyzed;
+            # waits for a background refresh of the same report if one is running
+            snapshot = news_analyzer.run_analysis(
+                config_feeds, config_keywords, recent_hours,
+                delay=1,  # Rate limiting
+                log=st.write
+            )
+            
+            st.session_state.processing = False
+            if snapshot is None:
+                status.update(label="❌ No results", state="error")
+                st.error("No results. Please check your internet connection and RSS feeds.")
+            else:
+                st.session_state.results = snapshot['results']
+                st.session_state.trending = snapshot['trending']
+                st.session_state.report_key = config_key
+                st.session_state.report_created = snapshot['created']
+                st.session_state.report_checked = snapshot['checked']
                 status.update(label="✅ Analysis complete!", state="complete")
-                
+            
         except Exception as e:
             st.session_state.processing = False
             status.update(label="❌ Processing failed", state="error")
@@ -0,0 +1,358 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import realnews
+
+
+def make_store(n=5, words=60):
+    store = realnews.ArticleStore()
+    for k in range(n):
+        body = " ".join(f"wörd{k}x{j}" for j in range(words))
+        store.add_article(f"Title {k}\n\n{body}", f"Title {k}", f"https://example.com/{k}",
+                          "Mon, 01 Jan 2024", f"https://feed{k % 2}.example.com/rss")
+    for k in range(n):
+        store.add_chunk(k, 0, 20)
+        store.add_chunk(k, 10, 30)
+    return store
+
+
+def rewrite_meta(path, update):
+    """Rewrite the metadata section of a saved store, keeping the columns"""
+    data = open(path, 'rb').read()
+    header = realnews._STORE_HEADER
+    fields = list(header.unpack_from(data, 0))
+    meta_len = fields[4]
+    meta = json.loads(data[header.size:header.size + meta_len])
+    update(meta)
+    rest = data[realnews._align8(header.size + meta_len):]
+    new_meta = json.dumps(meta).encode('utf-8')
+    fields[4] = len(new_meta)
+    pad = realnews._align8(header.size + len(new_meta)) - header.size - len(new_meta)
+    with open(path, 'wb') as f:
+        f.write(header.pack(*fields) + new_meta + b'\0' * pad + rest)
+
+
+# -------------------
+# Article Store
+# -------------------
+
+def test_add_article_skips_duplicates_and_interns_feeds():
+    store = make_store()
+    assert store.add_article("x" * 60, "Other", "https://example.com/1", "", "f") == -1
+    assert len(store) == 5
+    assert store.feeds == ["https://feed0.example.com/rss", "https://feed1.example.com/rss"]
+    assert list(store.feed_index) == [0, 1, 0, 1, 0]
+
+
+def test_save_load_round_trip(tmp_path):
+    store = make_store()
+    path = tmp_path / "store.articles"
+    store.save(path)
+
+    loaded = realnews.ArticleStore.load(path)
+    try:
+        assert len(loaded) == len(store)
+        assert isinstance(loaded.chunk_parent, memoryview)
+        for i in range(len(store)):
+            assert loaded.text(i) == store.text(i)
+            assert loaded.metadata(i) == store.metadata(i)
+        assert list(loaded.chunks.texts()) == list(store.chunks.texts())
+        assert loaded.diff(store) == []
+    finally:
+        loaded.close()
+
+
+def test_loaded_store_can_be_modified_and_saved(tmp_path):
+    path = tmp_path / "store.articles"
+    make_store().save(path)
+
+    loaded = realnews.ArticleStore.load(path)
+    assert loaded.add_article("New\n\n" + "body " * 20, "New", "https://example.com/new", "", "f") == 5
+    loaded.add_chunk(5, 0, 3)
+    assert loaded._blob is None
+
+    loaded.save(tmp_path / "copy.articles")
+    copy = realnews.ArticleStore.load(tmp_path / "copy.articles")
+    try:
+        assert len(copy) == 6
+        assert copy.text(0) == loaded.text(0)
+        assert copy.chunk_text(len(copy.chunks) - 1) == "New"
+    finally:
+        copy.close()
+
+
+def test_diff_works_after_close(tmp_path):
+    path = tmp_path / "store.articles"
+    make_store(3).save(path)
+    seen = realnews.ArticleStore.load(path)
+    seen.close()
+
+    current = make_store(4)
+    assert current.diff(seen) == [3]
+    assert seen.diff(make_store(2)) == [2]
+
+
+@pytest.mark.parametrize("cut", [0, 10, 100, -1])
+def test_load_rejects_truncated_files(tmp_path, cut):
+    path = tmp_path / "store.articles"
+    make_store().save(path)
+    data = open(path, 'rb').read()
+    path.write_bytes(data[:cut])
+
+    with pytest.raises(ValueError, match="store.articles"):
+        realnews.ArticleStore.load(path)
+
+
+def test_load_rejects_missing_feeds(tmp_path):
+    path = tmp_path / "store.articles"
+    make_store().save(path)
+    rewrite_meta(path, lambda meta: meta.pop('feeds'))
+
+    with pytest.raises(ValueError, match="feeds"):
+        realnews.ArticleStore.load(path)
+
+
+def test_load_rejects_out_of_range_feed_index(tmp_path):
+    path = tmp_path / "store.articles"
+    make_store().save(path)
+    rewrite_meta(path, lambda meta: meta.update(feeds=meta['feeds'][:1]))
+
+    with pytest.raises(ValueError, match="feed index"):
+        realnews.ArticleStore.load(path)
+
+
+def test_load_rejects_out_of_range_chunk_parent(tmp_path):
+    store = make_store()
+    store.add_chunk(0, 0, 1)
+    store.chunk_parent[-1] = 99
+    path = tmp_path / "store.articles"
+    store.save(path)
+
+    with pytest.raises(ValueError, match="chunk parent"):
+        realnews.ArticleStore.load(path)
+
+
+# -------------------
+# Chunking
+# -------------------
+
+def sample_texts():
+    paragraph = "Markets rallied today. Science news and politics dominated the headlines. "
+    return [
+        "Short title\n\n" + paragraph * 3,
+        "Long article\n\n" + "\n\n".join(paragraph * (k + 2) for k in range(12)),
+        "No separators " + "x" * 2500,
+        "Lines\n" + "\n".join(f"line {k} of the report with several words" for k in range(80)),
+    ]
+
+
+def test_split_docs_stores_offset_views():
+    store = realnews.ArticleStore()
+    for k, text in enumerate(sample_texts()):
+        store.add_article(text, f"T{k}", f"https://example.com/{k}", "", "feed")
+
+    chunks = realnews.split_docs(store, chunk_size=300, chunk_overlap=50, log=lambda msg: None)
+
+    expected = [
+        (i, chunk)
+        for i, text in enumerate(sample_texts())
+        for chunk in realnews._split_text(text, 300, 50)
+        if len(chunk.split()) >= realnews.MIN_CHUNK_WORDS
+    ]
+    assert [(store.chunk_parent[i], text) for i, text in enumerate(chunks.texts())] == expected
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(1000, 200), (300, 50), (80, 0)])
+def test_split_text_matches_langchain(chunk_size, chunk_overlap):
+    splitters = pytest.importorskip("langchain_text_splitters")
+    splitter = splitters.RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=realnews.CHUNK_SEPARATORS
+    )
+    for text in sample_texts():
+        assert realnews._split_text(text, chunk_size, chunk_overlap) == splitter.split_text(text)
+
+
+# -------------------
+# Report Snapshots
+# -------------------
+
+class FakeVectorStore:
+    def __init__(self):
+        self.docs = {}
+
+    def add_documents(self, documents, ids):
+        self.docs.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+    def persist(self):
+        pass
+
+    def as_retriever(self, search_type, search_kwargs):
+        docs = [self.docs[chunk_id] for chunk_id in sorted(self.docs)][:search_kwargs['k']]
+        return SimpleNamespace(get_relevant_documents=lambda query: docs)
+
+
+class Pipeline:
+    """Fake feeds, vector store and LLM around the real run_analysis"""
+
+    def __init__(self, monkeypatch, tmp_path):
+        self.entries = []
+        self.stores = {}
+        self.embedded = []
+        self.llm_calls = []
+        self.failing = set()
+        self.minute = 0
+
+        base = realnews.datetime(2024, 1, 1)
+        pipeline = self
+
+        class Clock(realnews.datetime):
+            @classmethod
+            def utcnow(cls):
+                return base + realnews.timedelta(minutes=pipeline.minute)
+
+        monkeypatch.setattr(realnews, 'datetime', Clock)
+        monkeypatch.setattr(realnews, 'SNAPSHOT_DIR', str(tmp_path / "snapshots"))
+        monkeypatch.setattr(realnews, 'fetch_rss_feed', self.fetch_rss_feed)
+        monkeypatch.setattr(realnews, 'get_vectorstore', self.get_vectorstore)
+        monkeypatch.setattr(realnews, 'add_chunks', self.add_chunks)
+        monkeypatch.setattr(realnews, 'summarize_text', self.summarize_text)
+        monkeypatch.setattr(realnews, 'analyze_sentiment', lambda text, fallback=True, log=print: "Positive")
+
+    def article(self, title, link):
+        body = " ".join(f"{title.lower()} technology word{j}" for j in range(20))
+        self.entries.append((f"{title}\n\n{body}", title, link))
+
+    def fetch_rss_feed(self, url, store, timeout=10, log=print):
+        return sum(store.add_article(content, title, link, "", url) >= 0
+                   for content, title, link in self.entries)
+
+    def get_vectorstore(self, persist_directory=None, log=print):
+        if not os.path.isdir(persist_directory):
+            os.makedirs(persist_directory)
+            self.stores[persist_directory] = FakeVectorStore()
+        return self.stores[persist_directory]
+
+    def add_chunks(self, vectorstore, chunks, parents=None, batch_size=256):
+        # Same selection as realnews.add_chunks, without building LangChain Documents
+        store = chunks.store
+        ids = store.chunk_ids()
+        selected = [i for i, parent in enumerate(store.chunk_parent) if parents is None or parent in parents]
+        vectorstore.add_documents(
+            [SimpleNamespace(page_content=store.chunk_text(i), metadata=store.metadata(store.chunk_parent[i]))
+             for i in selected],
+            [ids[i] for i in selected]
+        )
+        self.embedded.append(sorted({store.titles[store.chunk_parent[i]] for i in selected}))
+        return len(selected)
+
+    def summarize_text(self, docs, fallback=True, log=print):
+        title = docs[0].metadata['title']
+        self.llm_calls.append(title)
+        if title in self.failing:
+            raise RuntimeError("429 rate limit")
+        return f"Summary of {title} technology"
+
+    def run(self):
+        self.minute += 1
+        return realnews.run_analysis(["https://feed.example.com/rss"], ["technology"], 24,
+                                     delay=0, log=lambda msg: None)
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    return Pipeline(monkeypatch, tmp_path)
+
+
+def summaries(snapshot):
+    return sorted((item['title'], item['summary']) for item in snapshot['results'])
+
+
+def test_run_analysis_only_processes_new_articles(pipeline):
+    pipeline.article("Alpha", "https://example.com/a")
+    pipeline.article("Beta", "https://example.com/b")
+    first = pipeline.run()
+    assert pipeline.embedded == [["Alpha", "Beta"]]
+    assert sorted(pipeline.llm_calls) == ["Alpha", "Beta"]
+
+    pipeline.llm_calls.clear()
+    unchanged = pipeline.run()
+    assert pipeline.llm_calls == [] and len(pipeline.embedded) == 1
+    assert unchanged['created'] == first['created']
+    assert unchanged['checked'] > first['checked']
+    assert realnews.load_snapshot(first['key'])['checked'] == unchanged['checked']
+
+    pipeline.article("Gamma", "https://example.com/c")
+    added = pipeline.run()
+    assert pipeline.embedded[-1] == ["Gamma"]
+    assert pipeline.llm_calls == ["Gamma"]
+    assert [title for title, _ in summaries(added)] == ["Alpha", "Beta", "Gamma"]
+
+    pipeline.llm_calls.clear()
+    del pipeline.entries[0]
+    dropped = pipeline.run()
+    assert pipeline.embedded[-1] == []
+    assert pipeline.llm_calls == []
+    assert [title for title, _ in summaries(dropped)] == ["Beta", "Gamma"]
+    store, = pipeline.stores.values()
+    assert {doc.metadata['title'] for doc in store.docs.values()} == {"Beta", "Gamma"}
+
+
+def test_failed_analysis_is_retried(pipeline):
+    pipeline.article("Alpha", "https://example.com/a")
+    pipeline.article("Beta", "https://example.com/b")
+    pipeline.failing.add("Beta")
+    first = pipeline.run()
+    assert {item['title']: item['analyzed'] for item in first['results']} == {"Alpha": True, "Beta": False}
+
+    pipeline.failing.clear()
+    pipeline.llm_calls.clear()
+    retried = pipeline.run()
+    assert pipeline.llm_calls == ["Beta"]
+    assert all(item['analyzed'] for item in retried['results'])
+
+
+def test_linkless_articles_do_not_share_results(pipeline):
+    pipeline.article("Alpha", "")
+    pipeline.run()
+    pipeline.article("Beta", "")
+    snapshot = pipeline.run()
+
+    assert summaries(snapshot) == [("Alpha", "Summary of Alpha technology"),
+                                   ("Beta", "Summary of Beta technology")]
+
+
+def test_analyze_candidates_never_reuses_without_article_key(monkeypatch):
+    monkeypatch.setattr(realnews, 'summarize_text', lambda docs, fallback=True, log=print: "fresh")
+    monkeypatch.setattr(realnews, 'analyze_sentiment', lambda text, fallback=True, log=print: "Positive")
+    previous = [{"summary": "stale", "sentiment": "Negative", "topic": "General", "url": "",
+                 "title": "A", "article_key": None, "analyzed": True}]
+    doc = SimpleNamespace(page_content="B", metadata={'source': '', 'title': 'B'})
+
+    results = realnews.analyze_candidates([doc], ["technology"], previous, delay=0, log=lambda msg: None)
+    assert results[0]['summary'] == "fresh" and results[0]['title'] == "B"
+
+
+@pytest.mark.parametrize("content", ["[]", "{}", '{"version": 3, "key": "k"}', "not json"])
+def test_load_snapshot_rejects_malformed_reports(monkeypatch, tmp_path, content):
+    monkeypatch.setattr(realnews, 'SNAPSHOT_DIR', str(tmp_path))
+    (tmp_path / "k.json").write_text(content)
+    assert realnews.load_snapshot("k") is None
+
+
+def test_add_chunks_embeds_selected_articles_with_stable_ids():
+    pytest.importorskip("langchain_core")
+    store = make_store(3)
+    vectorstore = FakeVectorStore()
+
+    assert realnews.add_chunks(vectorstore, store.chunks, parents={1}) == 2
+    assert sorted(vectorstore.docs) == store.chunk_ids()[2:4]
+    doc = vectorstore.docs[store.chunk_ids()[2]]
+    assert doc.page_content == store.chunk_text(2)
+    assert doc.metadata['article_key'] == "https://example.com/1"